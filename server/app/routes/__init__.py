@@ -5,5 +5,6 @@ Routes package initializer.
 from .transcribe import router as transcribe_router
 from .upload import router as upload_router
 from .video import router as video_router
+from .search import router as search_router
 
-__all__ = ['transcribe_router', 'upload_router', 'video_router']
\ No newline at end of file
+__all__ = ['transcribe_router', 'upload_router', 'video_router', 'search_router']
\ No newline at end of file
@@ -0,0 +1,54 @@
+"""
+Search endpoints over indexed transcripts.
+"""
+import asyncio
+import logging
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel
+
+from app.services.search import get_transcript_index
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+class SearchMatch(BaseModel):
+    start: float
+    end: float
+    text: str
+
+class SearchHit(BaseModel):
+    video_id: str
+    segment_id: int
+    text: str
+    segment_start: float
+    segment_end: float
+    start: float
+    end: float
+    score: float
+    matches: List[SearchMatch]
+
+class SearchResponse(BaseModel):
+    query: str
+    hits: List[SearchHit]
+
+@router.get("/search", response_model=SearchResponse)
+async def search_transcripts(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=200),
+    video_id: Optional[str] = None,
+):
+    """
+    Search all indexed transcripts.
+    Words are matched individually, "quoted text" as a phrase and a trailing *
+    as a prefix. Hits are ranked segments with the seek time of each match.
+    """
+    try:
+        hits = await asyncio.to_thread(get_transcript_index().search, q, limit=limit, video_id=video_id)
+        return {"query": q, "hits": hits}
+    except Exception as e:
+        logger.error(f"Error searching transcripts for '{q}': {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Search failed")
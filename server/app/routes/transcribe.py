@@ -1,9 +1,12 @@
 """
 Transcription endpoints for WhisperX API.
 """
+import asyncio
 import os
 import shutil
 import json
+import re
+import uuid
 import logging
 
 from fastapi import APIRouter, BackgroundTasks, File, UploadFile, HTTPException
@@ -11,63 +14,24 @@ from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import List, Optional
 
-import whisperx
-import torch
-
 import config
+from app.services import inference
+from app.services.audio import StreamingAudioSource
+from app.services.search import get_transcript_index
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
-# Caches for models
-asr_model = None
-align_models = {}
-
-def load_asr_model(model_name: str, device: str, compute_type: str):
-    global asr_model
-    if asr_model is not None:
-        return asr_model
-    try:
-        logger.info(f"Loading ASR model: {model_name} ({compute_type}) on {device}")
-        asr_model = whisperx.load_model(
-            model_name,
-            device,
-            compute_type=compute_type,
-            multilingual=None,
-            max_new_tokens=None,
-            clip_timestamps="0",
-            hallucination_silence_threshold=None,
-            hotwords=None
-        )
-        return asr_model
-    except Exception as e:
-        logger.error(f"Failed to load ASR model: {e}")
-        raise HTTPException(status_code=500, detail="Could not load ASR model")
-
-def get_align_model(language_code: str, align_model: Optional[str] = None):
-    global align_models
-    model_key = f"{language_code}_{align_model if align_model else 'default'}"
-    if model_key in align_models:
-        return align_models[model_key]
-    try:
-        logger.info(f"Loading alignment model for language: {language_code}" + 
-                  (f" using model: {align_model}" if align_model else ""))
-        model_a, metadata = whisperx.load_align_model(
-            language_code=language_code,
-            device=config.DEVICE,
-            model_name=align_model
-        )
-        align_models[model_key] = (model_a, metadata)
-        return model_a, metadata
-    except Exception as e:
-        logger.error(f"Failed to load alignment model: {e}")
-        raise HTTPException(status_code=500, detail="Could not load alignment model")
-
 def save_upload_file(upload_file: UploadFile) -> str:
-    file_name = upload_file.filename.replace(' ', '_')
-    file_path = os.path.join(config.UPLOAD_DIR, f"{file_name}.mp4")
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(upload_file.file, buffer)
+    file_name = os.path.basename(upload_file.filename).replace(' ', '_')
+    # Unique name in the temp dir so concurrent uploads never collide and the janitor can reclaim leftovers
+    file_path = os.path.join(config.TEMP_DIR, f"transcribe_{uuid.uuid4().hex}_{file_name}.mp4")
+    try:
+        with open(file_path, "wb") as buffer:
+            shutil.copyfileobj(upload_file.file, buffer)
+    except Exception:
+        cleanup_temp_file(file_path)
+        raise
     return file_path
 
 def cleanup_temp_file(path: str):
@@ -78,10 +42,31 @@ def cleanup_temp_file(path: str):
     except Exception as e:
         logger.error(f"Error removing file {path}: {e}")
 
+async def index_transcript(video_id: Optional[str], segments: List[dict]):
+    """Add a finished transcript to the search index; failures never fail the request."""
+    if not video_id:
+        return
+    try:
+        # The write may wait for another worker's transaction, so keep it off the event loop
+        await asyncio.to_thread(get_transcript_index().add, video_id, segments)
+    except Exception as e:
+        logger.error(f"Error indexing transcript of video {video_id}: {e}", exc_info=True)
+
+def video_id_from_path(file_path: str) -> Optional[str]:
+    """Extract the video_id from a stored video's filename (video_<id>_<name>)."""
+    match = re.match(r"video_([0-9a-fA-F-]{36})_", os.path.basename(file_path))
+    return match.group(1) if match else None
+
+def open_audio_source(file_path: str, pipelined: bool) -> StreamingAudioSource:
+    """Create the windowed audio source; pipelined runs use shorter windows so stages overlap sooner."""
+    window_seconds = config.PIPELINE_WINDOW_SECONDS if pipelined else config.STREAM_WINDOW_SECONDS
+    return StreamingAudioSource(file_path, window_seconds=window_seconds)
+
 router = APIRouter()
 
 class TranscriptionRequest(BaseModel):
     file_path: str
+    video_id: Optional[str] = None
     model_name: str = config.ASR_MODEL_NAME
     language: Optional[str] = None
     compute_type: str = config.COMPUTE_TYPE
@@ -89,6 +74,7 @@ class TranscriptionRequest(BaseModel):
     align_model: Optional[str] = None
     highlight_words: bool = False
     vad_onset: Optional[float] = None
+    pipelined: Optional[bool] = None
 
 class WordLevel(BaseModel):
     word: str
@@ -118,37 +104,31 @@ async def transcribe_audio(
     align_model: Optional[str] = None,
     highlight_words: bool = False,
     vad_onset: Optional[float] = None,
+    video_id: Optional[str] = None,
+    pipelined: Optional[bool] = None,
 ):
     """
     Upload and transcribe a video/audio file.
+    When video_id is given the transcript is added to the search index.
     """
     file_path = None
     try:
-        asr = load_asr_model(model_name, config.DEVICE, config.COMPUTE_TYPE)
         file_path = save_upload_file(file)
         logger.info(f"Saved uploaded file to {file_path}")
-        # Load and transcribe
-        audio = whisperx.load_audio(file_path)
-        
         # Apply VAD parameters if provided
         vad_parameters = {}
         if vad_onset is not None:
             vad_parameters["vad_onset"] = vad_onset
             logger.info(f"Using custom VAD onset: {vad_onset}")
         
-        result = asr.transcribe(audio, batch_size=batch_size, language=language, **vad_parameters)
-        language_code = result.get("language")
-        
-        # Align for word-level timestamps
-        model_a, metadata = get_align_model(language_code, align_model)
-        result = whisperx.align(
-            result.get("segments", []),
-            model_a,
-            metadata,
-            audio,
-            config.DEVICE,
-            return_char_alignments=False,
+        # Decode, transcribe and align window by window for word-level timestamps
+        pipelined = config.PIPELINED_TRANSCRIPTION if pipelined is None else pipelined
+        result = await inference.transcribe_source(
+            open_audio_source(file_path, pipelined), pipelined=pipelined,
+            model_name=model_name, compute_type=config.COMPUTE_TYPE, language=language,
+            batch_size=batch_size, align_model=align_model, vad_parameters=vad_parameters
         )
+        language_code = result.get("language")
         
         # Format output
         text = " ".join([seg.get("text", "") for seg in result.get("segments", [])])
@@ -160,6 +140,8 @@ async def transcribe_audio(
                 start=seg.get("start"), end=seg.get("end"), words=words
             ))
         
+        await index_transcript(video_id, result.get("segments", []))
+        
         # Schedule cleanup
         background_tasks.add_task(cleanup_temp_file, file_path)
         
@@ -169,37 +151,36 @@ async def transcribe_audio(
             
         return JSONResponse(content=response_data)
     except HTTPException:
+        if file_path:
+            cleanup_temp_file(file_path)
         raise
     except Exception as e:
         logger.error(f"Error during transcription: {e}", exc_info=True)
+        if file_path:
+            cleanup_temp_file(file_path)
         raise HTTPException(status_code=500, detail="Transcription failed")
 
 @router.post("/transcribe-file/", response_model=TranscriptionResponse)
 async def transcribe_file_endpoint(request: TranscriptionRequest):
     """
     Transcribe a file already on the server.
+    Stored videos are added to the search index under their video_id.
     """
     try:
-        asr = load_asr_model(request.model_name, config.DEVICE, request.compute_type)
-        audio = whisperx.load_audio(request.file_path)
-        
         # Apply VAD parameters if provided
         vad_parameters = {}
         if request.vad_onset is not None:
             vad_parameters["vad_onset"] = request.vad_onset
             logger.info(f"Using custom VAD onset: {request.vad_onset}")
             
-        result = asr.transcribe(
-            audio, batch_size=request.batch_size, language=request.language, **vad_parameters
+        pipelined = config.PIPELINED_TRANSCRIPTION if request.pipelined is None else request.pipelined
+        result = await inference.transcribe_source(
+            open_audio_source(request.file_path, pipelined), pipelined=pipelined,
+            model_name=request.model_name, compute_type=request.compute_type, language=request.language,
+            batch_size=request.batch_size, align_model=request.align_model, vad_parameters=vad_parameters
         )
         language_code = result.get("language")
         
-        model_a, metadata = get_align_model(language_code, request.align_model)
-        result = whisperx.align(
-            result.get("segments", []), model_a, metadata,
-            audio, config.DEVICE, return_char_alignments=False
-        )
-        
         text = " ".join([seg.get("text", "") for seg in result.get("segments", [])])
         segments = []
         for seg in result.get("segments", []):
@@ -208,6 +189,8 @@ async def transcribe_file_endpoint(request: TranscriptionRequest):
                 id=seg.get("id"), text=seg.get("text"),
                 start=seg.get("start"), end=seg.get("end"), words=words
             ))
+        
+        await index_transcript(request.video_id or video_id_from_path(request.file_path), result.get("segments", []))
             
         response_data = {"text": text, "segments": segments, "language": language_code}
         if request.highlight_words:
@@ -2,10 +2,13 @@ import os
 import uuid
 import logging
 
-from fastapi import APIRouter, File, UploadFile, HTTPException
+from fastapi import APIRouter, File, UploadFile, HTTPException, Header, Request
+from pydantic import BaseModel
+from typing import Optional
 
 import config
 from app.services.storage import get_storage_service
+from app.services import upload_sessions
 
 # Initialize logger
 logger = logging.getLogger(__name__)
@@ -33,4 +36,119 @@ async def create_upload_file(file: UploadFile = File(...)):
     except Exception as e:
         logger.error(f"Could not upload file: {e}", exc_info=True)
         # It's good practice to not expose internal error details to the client directly in production
-        raise HTTPException(status_code=500, detail="Could not process uploaded file.") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Could not process uploaded file.")
+
+class UploadSessionRequest(BaseModel):
+    filename: str
+    total_size: int
+    content_type: Optional[str] = None
+    chunk_size: Optional[int] = None
+
+@router.post("/upload/sessions")
+async def create_upload_session(request: UploadSessionRequest):
+    """
+    Starts a resumable chunked upload and returns the session layout.
+    The client must split the file using the returned chunk_size.
+    """
+    try:
+        storage_service = get_storage_service()
+        manifest = await upload_sessions.create_session(
+            storage_service, request.filename, request.total_size,
+            content_type=request.content_type, chunk_size=request.chunk_size
+        )
+        return {
+            "upload_id": manifest["upload_id"],
+            "video_id": manifest["video_id"],
+            "chunk_size": manifest["chunk_size"],
+            "chunk_count": manifest["chunk_count"],
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Could not create upload session: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Could not create upload session.")
+
+@router.put("/upload/sessions/{upload_id}/chunks/{index}")
+async def upload_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    x_chunk_sha256: str = Header(...),
+):
+    """
+    Stores one chunk of an upload session. The raw request body is the chunk
+    and the X-Chunk-SHA256 header carries its hex encoded SHA-256 checksum.
+    Chunks may be sent in parallel and re-sent safely.
+    """
+    try:
+        storage_service = get_storage_service()
+        manifest = await upload_sessions.load_session(storage_service, upload_id)
+        content_length = request.headers.get("content-length")
+        if content_length and not content_length.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid Content-Length header")
+        if content_length and int(content_length) > manifest["chunk_size"]:
+            raise HTTPException(status_code=413, detail="Chunk larger than the session chunk size")
+        # Count while reading: a chunked transfer encoding carries no Content-Length
+        parts, received = [], 0
+        async for part in request.stream():
+            received += len(part)
+            if received > manifest["chunk_size"]:
+                raise HTTPException(status_code=413, detail="Chunk larger than the session chunk size")
+            parts.append(part)
+        data = b"".join(parts)
+        return await upload_sessions.put_chunk(storage_service, manifest, index, data, x_chunk_sha256)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Could not store chunk {index} of upload {upload_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Could not store chunk.")
+
+@router.get("/upload/sessions/{upload_id}")
+async def get_upload_session(upload_id: str):
+    """
+    Reports which chunks and byte ranges of an upload session are already stored,
+    so an interrupted client can resume with only the missing chunks.
+    """
+    try:
+        storage_service = get_storage_service()
+        manifest = await upload_sessions.load_session(storage_service, upload_id)
+        return await upload_sessions.session_status(storage_service, manifest)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Could not read upload session {upload_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Could not read upload session.")
+
+@router.post("/upload/sessions/{upload_id}/complete")
+async def complete_upload_session(upload_id: str):
+    """
+    Assembles all chunks of an upload session into the stored video
+    and returns its video ID.
+    """
+    try:
+        storage_service = get_storage_service()
+        manifest = await upload_sessions.load_session(storage_service, upload_id)
+        file_path = await upload_sessions.complete_session(storage_service, manifest)
+        logger.info(f"Upload session {upload_id} completed as video_id='{manifest['video_id']}' at '{file_path}'")
+        return {"video_id": manifest["video_id"]}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Could not complete upload session {upload_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Could not complete upload session.")
+
+@router.delete("/upload/sessions/{upload_id}")
+async def abort_upload_session(upload_id: str):
+    """
+    Cancels an upload session and discards its stored chunks.
+    """
+    try:
+        storage_service = get_storage_service()
+        manifest = await upload_sessions.load_session(storage_service, upload_id)
+        await storage_service.delete_upload_session(manifest["upload_id"])
+        return {"upload_id": manifest["upload_id"], "deleted": True}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Could not delete upload session {upload_id}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Could not delete upload session.")
@@ -0,0 +1,118 @@
+"""
+Bounded-memory audio decoding.
+
+StreamingAudioSource decodes media with ffmpeg into 16 kHz mono samples and
+yields them in windows of at most STREAM_WINDOW_SECONDS, instead of loading
+the whole recording into one array like whisperx.load_audio. Windows are cut
+at the quietest point near their end so words are rarely split.
+"""
+import logging
+import subprocess
+import tempfile
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+import config
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+# Sample rate expected by WhisperX
+SAMPLE_RATE = 16000
+# Length of the frames compared when looking for a quiet split point
+SPLIT_FRAME_SECONDS = 0.1
+
+def offset_segments(segments: List[dict], offset: float, first_id: int) -> List[dict]:
+    """Shift window-relative timestamps to the recording timeline and renumber segments."""
+    for i, seg in enumerate(segments):
+        seg["id"] = first_id + i
+        for item in [seg] + seg.get("words", []):
+            for key in ("start", "end"):
+                if item.get(key) is not None:
+                    item[key] = round(item[key] + offset, 3)
+    return segments
+
+class StreamingAudioSource:
+    """Iterates over (offset_seconds, samples) windows of a media file."""
+
+    def __init__(
+        self,
+        file_path: str,
+        window_seconds: float = config.STREAM_WINDOW_SECONDS,
+        split_search_seconds: float = config.STREAM_SPLIT_SEARCH_SECONDS,
+    ):
+        """
+        Initialize a streaming audio source.
+
+        Args:
+            file_path: Path of the audio or video file
+            window_seconds: Maximum length of a yielded window
+            split_search_seconds: How far back from the end of a window to
+                look for a quiet point to cut at
+        """
+        self.file_path = file_path
+        self.window_samples = int(window_seconds * SAMPLE_RATE)
+        self.split_search_samples = min(int(split_search_seconds * SAMPLE_RATE), self.window_samples // 2)
+
+    def _split_point(self, samples: np.ndarray) -> int:
+        """Return the index of the quietest frame start in the tail of a window."""
+        frame = int(SPLIT_FRAME_SECONDS * SAMPLE_RATE)
+        search_start = len(samples) - self.split_search_samples
+        tail = samples[search_start:]
+        n_frames = len(tail) // frame
+        if n_frames == 0:
+            return len(samples)
+        energy = np.square(tail[:n_frames * frame].astype(np.float32)).reshape(n_frames, frame).mean(axis=1)
+        return search_start + int(np.argmin(energy)) * frame
+
+    def __iter__(self) -> Iterator[Tuple[float, np.ndarray]]:
+        cmd = [
+            "ffmpeg", "-nostdin", "-threads", "0", "-loglevel", "error",
+            "-i", self.file_path,
+            "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE),
+            "-",
+        ]
+        # stderr goes to a file: an unread pipe would fill up and stall ffmpeg while we wait on stdout
+        stderr_file = tempfile.TemporaryFile()
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file)
+        offset_samples = 0
+        carry: Optional[np.ndarray] = None
+        finished = False
+        try:
+            while True:
+                carried = 0 if carry is None else len(carry)
+                raw = process.stdout.read((self.window_samples - carried) * 2)
+                samples = np.frombuffer(raw[:len(raw) - len(raw) % 2], dtype=np.int16)
+                if carry is not None:
+                    samples = np.concatenate([carry, samples])
+                    carry = None
+                if len(samples) == 0:
+                    finished = True
+                    break
+
+                end_of_stream = len(samples) < self.window_samples
+                cut = len(samples) if end_of_stream else self._split_point(samples)
+                if cut < len(samples):
+                    carry = samples[cut:].copy()
+                window = samples[:cut].astype(np.float32) / 32768.0
+                yield offset_samples / SAMPLE_RATE, window
+                offset_samples += cut
+                if end_of_stream:
+                    finished = True
+                    break
+        finally:
+            process.stdout.close()
+            if not finished:
+                # The consumer stopped early; do not wait for ffmpeg to finish decoding
+                process.kill()
+            returncode = process.wait()
+            # Keep only the tail; a damaged file can log an error per packet
+            stderr_file.seek(max(0, stderr_file.seek(0, 2) - 4096))
+            stderr = stderr_file.read().decode(errors="replace")
+            stderr_file.close()
+
+        if returncode != 0:
+            # Also raised after a partial decode, so a truncated transcript is never returned
+            raise RuntimeError(f"Failed to load audio after {offset_samples / SAMPLE_RATE:.1f}s: {stderr}")
+        logger.info(f"Decoded {offset_samples / SAMPLE_RATE:.1f}s of audio from {self.file_path}")
@@ -0,0 +1,190 @@
+"""
+Local disk cache in front of remote storage.
+
+Remote blobs are downloaded once into a managed directory and served from
+there on later requests. The cache keeps a byte budget with LRU eviction,
+and concurrent requests for the same blob share a single download.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+import config
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+# Suffix of files that are still being downloaded
+PARTIAL_SUFFIX = ".part"
+
+class DiskCache:
+    """Byte-bounded LRU cache of files on the local disk."""
+
+    def __init__(self, cache_dir: str, max_bytes: int, eviction_grace: float = 60.0):
+        """
+        Initialize the disk cache and adopt files left by a previous run.
+
+        Args:
+            cache_dir: Directory where cached files are stored
+            max_bytes: Total size the cache tries to stay under
+            eviction_grace: Seconds after its last access during which an entry
+                is not evicted, so files that are being served are not removed
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.eviction_grace = eviction_grace
+        # path -> (size, last access time), least recently used first
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._total_bytes = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+        # Guards the entries; the janitor reconciles them from a worker thread
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._adopt_existing()
+        logger.info(f"DiskCache initialized at {cache_dir} ({self._total_bytes}/{max_bytes} bytes used)")
+
+    def _adopt_existing(self):
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(PARTIAL_SUFFIX) or not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            files.append((stat.st_atime, path, stat.st_size))
+        for atime, path, size in sorted(files):
+            self._entries[path] = (size, atime)
+            self._total_bytes += size
+
+    def path_for(self, key: str, suffix: str = "") -> str:
+        """Return the cache path used for a key."""
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode()).hexdigest() + suffix)
+
+    async def get_or_fetch(self, key: str, fetch: Callable[[str], None], suffix: str = "") -> str:
+        """
+        Return a local path for a key, downloading it on a miss.
+
+        Args:
+            key: Identifier of the remote object; include its version so that
+                overwritten objects are fetched again
+            fetch: Blocking function that writes the object to the given path
+            suffix: File extension for the cached file
+
+        Returns:
+            Path of the cached file
+        """
+        path = self.path_for(key, suffix)
+        if path in self._entries and os.path.exists(path):
+            self._touch(path)
+            return path
+
+        task = self._inflight.get(path)
+        if task is None:
+            # The download runs detached from this request, so a client that
+            # disconnects neither cancels it for other waiters nor leaves a partial file
+            task = asyncio.create_task(self._download(key, path, fetch))
+            self._inflight[path] = task
+            task.add_done_callback(lambda done: self._finish_download(path, done))
+        return await asyncio.shield(task)
+
+    async def _download(self, key: str, path: str, fetch: Callable[[str], None]) -> str:
+        partial_path = f"{path}.{os.getpid()}{PARTIAL_SUFFIX}"
+        try:
+            await asyncio.to_thread(fetch, partial_path)
+            os.replace(partial_path, path)
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        self._add(path, os.path.getsize(path))
+        logger.info(f"Cached '{key}' at {path}")
+        return path
+
+    def _finish_download(self, path: str, task: asyncio.Task):
+        del self._inflight[path]
+        if not task.cancelled() and task.exception() is not None:
+            # Retrieved here in case every requester stopped waiting
+            logger.warning(f"Download of {path} failed: {task.exception()}")
+
+    def _touch(self, path: str):
+        with self._lock:
+            if path in self._entries:
+                size, _ = self._entries[path]
+                self._entries[path] = (size, time.time())
+                self._entries.move_to_end(path)
+
+    def _add(self, path: str, size: int):
+        with self._lock:
+            if path in self._entries:
+                self._total_bytes -= self._entries[path][0]
+            self._entries[path] = (size, time.time())
+            self._entries.move_to_end(path)
+            self._total_bytes += size
+            self._evict()
+
+    def _evict(self):
+        now = time.time()
+        for path in list(self._entries):
+            if self._total_bytes <= self.max_bytes:
+                break
+            size, last_access = self._entries[path]
+            if now - last_access < self.eviction_grace:
+                # Entries are ordered by access time, so all later ones are recent too
+                break
+            del self._entries[path]
+            self._total_bytes -= size
+            try:
+                os.remove(path)
+                logger.info(f"Evicted {path} from cache ({size} bytes)")
+            except FileNotFoundError:
+                pass
+
+    def remove_orphans(self, max_age: float) -> int:
+        """
+        Delete files in the cache directory that the cache does not track,
+        such as partial downloads left by a crashed process.
+
+        Args:
+            max_age: Minimum age in seconds of a file before it is removed
+
+        Returns:
+            Number of files removed
+        """
+        removed = 0
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if path in self._entries or path in self._inflight:
+                continue
+            if name.endswith(PARTIAL_SUFFIX) and path.rsplit(".", 2)[0] in self._inflight:
+                # Still being downloaded by this process
+                continue
+            if not name.endswith(PARTIAL_SUFFIX):
+                # Another worker may own this file; adopt rather than delete it
+                if os.path.isfile(path):
+                    self._add(path, os.path.getsize(path))
+                continue
+            try:
+                if now - os.path.getmtime(path) > max_age:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        # Forget entries whose files were removed by another worker
+        with self._lock:
+            for path in [p for p in self._entries if not os.path.exists(p)]:
+                self._total_bytes -= self._entries.pop(path)[0]
+        return removed
+
+_video_cache: Optional[DiskCache] = None
+
+def get_video_cache() -> DiskCache:
+    """Return the process-wide cache used for remote videos."""
+    global _video_cache
+    if _video_cache is None:
+        _video_cache = DiskCache(config.CACHE_DIR, config.CACHE_MAX_BYTES, config.CACHE_EVICTION_GRACE_SECONDS)
+    return _video_cache
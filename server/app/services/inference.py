@@ -0,0 +1,199 @@
+"""
+Inference dispatch for the API workers.
+
+With INFERENCE_MODE=local (default) models are loaded in the API worker.
+With INFERENCE_MODE=server the worker hands decoded audio to one of the
+model server processes started from model_server.py: the samples are placed
+in a shared memory block and only its name and the request parameters are
+sent over a Unix socket, so large arrays are never pickled and HTTP workers
+do not hold any model in memory.
+"""
+import asyncio
+import functools
+import itertools
+import logging
+import socket
+from concurrent.futures import ThreadPoolExecutor
+# Client() has no timeout, so connections are opened with these and a deadline
+from multiprocessing.connection import Connection, answer_challenge, deliver_challenge
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional
+
+import numpy as np
+from fastapi import HTTPException
+
+import config
+from app.services.audio import StreamingAudioSource, offset_segments
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+def server_addresses() -> List[str]:
+    """Return the socket paths of the configured model servers."""
+    return [f"{config.INFERENCE_SOCKET}.{i}" for i in range(config.INFERENCE_SERVERS)]
+
+def inference_authkey() -> bytes:
+    """Return the key that authenticates connections to the model servers."""
+    if not config.INFERENCE_AUTHKEY:
+        logger.error("INFERENCE_AUTHKEY environment variable is required for INFERENCE_MODE=server")
+        raise ValueError("INFERENCE_AUTHKEY environment variable is required")
+    return config.INFERENCE_AUTHKEY
+
+# With INFERENCE_MODE=local all inference of this worker runs on one thread:
+# a WhisperX pipeline swaps its tokenizer and options per call, so it must not
+# transcribe two requests at once
+_local_inference = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-inference")
+
+async def _run_local(func, *args, **kwargs):
+    """Run a blocking inference call on the local inference thread."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_local_inference, functools.partial(func, *args, **kwargs))
+
+# Spread requests from this worker over the model servers
+_next_address = itertools.cycle(server_addresses())
+
+# Threads waiting on model servers; a server runs one request at a time, so
+# further requests of this worker wait in the executor's queue instead of
+# occupying threads of the default executor
+_remote_inference = ThreadPoolExecutor(max_workers=config.INFERENCE_SERVERS, thread_name_prefix="model-server-client")
+
+async def _run_remote(func, *args):
+    """Run a blocking model server call on the model server client threads."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_remote_inference, func, *args)
+
+def _connect(address: str) -> Connection:
+    """Connect and authenticate to a model server within INFERENCE_CONNECT_TIMEOUT_SECONDS."""
+    timeout = config.INFERENCE_CONNECT_TIMEOUT_SECONDS
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.settimeout(timeout)
+        sock.connect(address)
+        sock.setblocking(True)
+        conn = Connection(sock.detach())
+    try:
+        # The server opens the handshake, so one that never accepts times out here
+        if not conn.poll(timeout):
+            raise TimeoutError(f"No handshake within {timeout}s")
+        authkey = inference_authkey()
+        answer_challenge(conn, authkey)
+        deliver_challenge(conn, authkey)
+    except BaseException:
+        conn.close()
+        raise
+    return conn
+
+def _recv(conn: Connection) -> dict:
+    """Return the next reply of a model server within INFERENCE_REPLY_TIMEOUT_SECONDS."""
+    if not conn.poll(config.INFERENCE_REPLY_TIMEOUT_SECONDS):
+        raise TimeoutError(f"No reply within {config.INFERENCE_REPLY_TIMEOUT_SECONDS}s")
+    return conn.recv()
+
+def _send_audio(conn, audio: np.ndarray, **message) -> dict:
+    """Send samples through a shared memory block and return the server's reply."""
+    audio = np.ascontiguousarray(audio, dtype=np.float32)
+    shm = SharedMemory(create=True, size=max(audio.nbytes, 1))
+    try:
+        np.ndarray(audio.shape, dtype=audio.dtype, buffer=shm.buf)[:] = audio
+        conn.send({"shm": shm.name, "shape": audio.shape, "dtype": audio.dtype.str, **message})
+        return _recv(conn)
+    finally:
+        shm.close()
+        shm.unlink()
+
+def _unpack(reply: dict) -> dict:
+    if not reply["ok"]:
+        raise HTTPException(status_code=reply.get("status_code", 500), detail=reply.get("detail", "Transcription failed"))
+    return reply["result"]
+
+def _transcribe_remote(address: str, audio: np.ndarray, params: dict) -> dict:
+    with _connect(address) as conn:
+        return _unpack(_send_audio(conn, audio, op="transcribe", params=params))
+
+def _pipeline_remote(address: str, source: StreamingAudioSource, params: dict) -> dict:
+    windows = iter(source)
+    try:
+        with _connect(address) as conn:
+            conn.send({"op": "pipeline", "params": params})
+            # The server acknowledges each window once copied, so the next one is decoded during its ASR
+            for offset, audio in windows:
+                reply = _send_audio(conn, audio, offset=offset)
+                if not reply.get("ack"):
+                    # The pipeline failed before all windows were sent
+                    return _unpack(reply)
+            conn.send({"end": True})
+            return _unpack(_recv(conn))
+    finally:
+        windows.close()
+
+async def transcribe(audio: np.ndarray, **params) -> dict:
+    """
+    Transcribe and align decoded audio in the configured inference backend.
+
+    Args:
+        audio: 16 kHz mono float32 samples
+        **params: Keyword arguments of run_transcription
+
+    Returns:
+        Dictionary with the aligned "segments" and the "language" code
+    """
+    if config.INFERENCE_MODE != "server":
+        from app.services.transcription import run_transcription
+        return await _run_local(run_transcription, audio, **params)
+
+    address = next(_next_address)
+    logger.info(f"Submitting {audio.shape[0]} samples to model server {address}")
+    try:
+        # Waiting for the model server must not block this worker's event loop
+        return await _run_remote(_transcribe_remote, address, audio, params)
+    except (ConnectionError, FileNotFoundError, EOFError, TimeoutError) as e:
+        logger.error(f"Model server {address} unavailable: {e}")
+        raise HTTPException(status_code=503, detail="Inference server unavailable")
+
+async def transcribe_source(
+    source: StreamingAudioSource, language: Optional[str] = None, pipelined: bool = False, **params
+) -> dict:
+    """
+    Transcribe and align a recording window by window.
+
+    Only a bounded number of windows of samples is alive at a time, so memory
+    does not grow with the length of the recording. The language detected in
+    the first window is used for the rest. In pipelined mode decoding, ASR,
+    alignment-model loading and alignment overlap (see run_pipelined_transcription).
+
+    Args:
+        source: The streaming audio source to read
+        language: Language code, detected from the first window when None
+        pipelined: Overlap the pipeline stages instead of running them in turn
+        **params: Other keyword arguments of run_transcription
+
+    Returns:
+        Dictionary with the aligned "segments" and the "language" code
+    """
+    if pipelined:
+        if config.INFERENCE_MODE != "server":
+            from app.services.transcription import run_pipelined_transcription
+            return await _run_local(run_pipelined_transcription, iter(source), language=language, **params)
+        address = next(_next_address)
+        logger.info(f"Streaming {source.file_path} to model server {address} (pipelined)")
+        try:
+            return await _run_remote(_pipeline_remote, address, source, dict(params, language=language))
+        except (ConnectionError, FileNotFoundError, EOFError, TimeoutError) as e:
+            logger.error(f"Model server {address} unavailable: {e}")
+            raise HTTPException(status_code=503, detail="Inference server unavailable")
+
+    segments: List[dict] = []
+    windows = iter(source)
+    try:
+        while True:
+            # Decoding blocks on ffmpeg, so keep it off the event loop
+            item = await asyncio.to_thread(next, windows, None)
+            if item is None:
+                break
+            offset, audio = item
+            result = await transcribe(audio, language=language, **params)
+            del audio, item
+            language = language or result.get("language")
+            segments.extend(offset_segments(result.get("segments", []), offset, len(segments)))
+    finally:
+        windows.close()
+    return {"segments": segments, "language": language}
@@ -0,0 +1,66 @@
+"""
+Background janitor that reclaims disk space.
+
+Periodically removes temporary upload files that outlived their request,
+orphaned partial cache downloads and abandoned upload sessions in the
+configured storage backend.
+"""
+import asyncio
+import logging
+import os
+import time
+
+import config
+from app.services.cache import get_video_cache
+from app.services.storage import get_storage_service
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+def _remove_stale_temp_files(now: float) -> int:
+    removed = 0
+    if not os.path.isdir(config.TEMP_DIR):
+        return removed
+    for name in os.listdir(config.TEMP_DIR):
+        path = os.path.join(config.TEMP_DIR, name)
+        try:
+            if os.path.isfile(path) and now - os.path.getmtime(path) > config.TEMP_FILE_TTL_SECONDS:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+def sweep() -> dict:
+    """
+    Run one cleanup pass over the local disk. Blocking; run it in a thread.
+
+    Returns:
+        Number of items removed per category
+    """
+    now = time.time()
+    return {
+        "temp_files": _remove_stale_temp_files(now),
+        "cache_partials": get_video_cache().remove_orphans(config.TEMP_FILE_TTL_SECONDS),
+    }
+
+async def run_janitor(interval: float = config.JANITOR_INTERVAL_SECONDS):
+    """
+    Run sweep() and expire abandoned upload sessions every interval seconds until cancelled.
+
+    Args:
+        interval: Seconds between cleanup passes
+    """
+    logger.info(f"Janitor started (interval: {interval}s)")
+    while True:
+        try:
+            # Scanning directories must not block the event loop
+            stats = await asyncio.to_thread(sweep)
+            stats["upload_sessions"] = await get_storage_service().expire_upload_sessions(
+                config.UPLOAD_SESSION_TTL_SECONDS
+            )
+            if any(stats.values()):
+                logger.info(f"Janitor removed {stats}")
+        except Exception as e:
+            logger.error(f"Janitor pass failed: {e}", exc_info=True)
+        await asyncio.sleep(interval)
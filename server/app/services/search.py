@@ -0,0 +1,332 @@
+"""
+Full-text search over stored transcripts.
+
+TranscriptIndex keeps every transcript segment in a SQLite database with an
+FTS5 index over its tokens, so all workers query one shared on-disk index
+instead of each holding its own copy in memory. FTS5 answers term, phrase
+and prefix queries and ranks segments with bm25. Each segment row also
+stores the start and end time of every token, so hits can seek straight to
+the spoken words.
+"""
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import List, Optional, Tuple
+
+import config
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"\w+(?:'\w+)*")
+# Query clauses: "quoted phrases" or single terms, optionally ending in * for prefix matching
+QUERY_RE = re.compile(r'"([^"]*)"|(\S+)')
+# Seconds a writer waits for another worker's transaction before failing
+BUSY_TIMEOUT_SECONDS = 30
+# Number of most recent segments used to estimate how common a query clause is
+FREQUENCY_SAMPLE_SEGMENTS = 2000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    segment_id INTEGER,
+    text TEXT NOT NULL,
+    seg_start REAL,
+    seg_end REAL,
+    -- Space separated output of tokenize(); the FTS5 tokenizer splits it back identically
+    tokens TEXT NOT NULL,
+    -- JSON list of [start, end] per token
+    token_times TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS segments_video_id ON segments (video_id);
+-- Rowid range of each video's segments; they are inserted in one transaction, so the range is contiguous
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    first_id INTEGER,
+    last_id INTEGER,
+    segment_count INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(
+    tokens,
+    content='segments',
+    content_rowid='id',
+    tokenize="unicode61 remove_diacritics 0 tokenchars '''_'",
+    prefix='2 3'
+);
+"""
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word tokens."""
+    return TOKEN_RE.findall(text.lower())
+
+def _word_timings(segment: dict) -> List[Tuple[str, float, float]]:
+    """
+    Return (word, start, end) for every word of a segment.
+
+    WhisperX leaves some words (often numerals) without timestamps. They are
+    kept so phrase positions stay adjacent, and are timed by the gap between
+    their aligned neighbours, or by the segment bounds at either end.
+    """
+    words = segment.get("words") or []
+    timings = []
+    for i, word in enumerate(words):
+        start, end = word.get("start"), word.get("end")
+        if start is None or end is None:
+            previous = next((w["end"] for w in reversed(words[:i]) if w.get("end") is not None), segment.get("start"))
+            following = next((w["start"] for w in words[i + 1:] if w.get("start") is not None), segment.get("end"))
+            start = previous if start is None else start
+            end = following if end is None else end
+        timings.append((word.get("word", ""), start, end))
+    return timings
+
+def _segment_row(video_id: str, seg: dict) -> tuple:
+    """Build the segments table row of one transcript segment."""
+    tokens: List[str] = []
+    times: List[Tuple[float, float]] = []
+    # Segments without words fall back to the segment timing
+    items = _word_timings(seg) or [(seg.get("text", ""), seg.get("start"), seg.get("end"))]
+    for text, start, end in items:
+        for token in tokenize(text):
+            tokens.append(token)
+            times.append((start, end))
+    return (
+        video_id, seg.get("id"), seg.get("text", "").strip(), seg.get("start"), seg.get("end"),
+        " ".join(tokens), json.dumps(times),
+    )
+
+def _fts_query(clauses: List[List[str]]) -> str:
+    """Translate parsed clauses into an FTS5 query matching any of them."""
+    def string(pattern: str) -> str:
+        # Tokens never contain double quotes, so quoting them is always safe
+        return f'"{pattern[:-1]}" *' if pattern.endswith("*") else f'"{pattern}"'
+    return " OR ".join(" + ".join(string(p) for p in patterns) for patterns in clauses)
+
+def _token_matches(token: str, pattern: str) -> bool:
+    return token.startswith(pattern[:-1]) if pattern.endswith("*") else token == pattern
+
+def _match_spans(tokens: List[str], clauses: List[List[str]]) -> List[Tuple[int, int]]:
+    """Return sorted (position, length) of every clause occurrence in a segment's tokens."""
+    spans = []
+    for patterns in clauses:
+        for p in range(len(tokens) - len(patterns) + 1):
+            if all(_token_matches(tokens[p + k], pattern) for k, pattern in enumerate(patterns)):
+                spans.append((p, len(patterns)))
+    return sorted(spans)
+
+class TranscriptIndex:
+    """Segment-level full-text index over all indexed transcripts."""
+
+    def __init__(self, db_path: str):
+        """
+        Open (and if needed create) the index database.
+
+        Args:
+            db_path: SQLite database shared by all workers
+        """
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # sqlite3 connections may not be shared between threads
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        logger.info(f"TranscriptIndex opened at {db_path}")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit; add() opens its own write transaction
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def add(self, video_id: str, segments: List[dict]):
+        """
+        Index (or re-index) the transcript of a video.
+
+        Args:
+            video_id: The unique identifier for the video
+            segments: Transcript segments with id, text, start, end and words
+        """
+        rows = [_segment_row(video_id, seg) for seg in segments]
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # An external content FTS5 table must be told which tokens each removed row had
+            conn.execute(
+                "INSERT INTO segments_fts (segments_fts, rowid, tokens) "
+                "SELECT 'delete', id, tokens FROM segments WHERE video_id = ?",
+                (video_id,),
+            )
+            conn.execute("DELETE FROM segments WHERE video_id = ?", (video_id,))
+            ids = []
+            for row in rows:
+                cursor = conn.execute(
+                    "INSERT INTO segments (video_id, segment_id, text, seg_start, seg_end, tokens, token_times) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    row,
+                )
+                ids.append(cursor.lastrowid)
+                conn.execute("INSERT INTO segments_fts (rowid, tokens) VALUES (?, ?)", (cursor.lastrowid, row[5]))
+            conn.execute(
+                "INSERT OR REPLACE INTO videos (video_id, first_id, last_id, segment_count) VALUES (?, ?, ?, ?)",
+                (video_id, min(ids, default=None), max(ids, default=None), len(ids)),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        logger.info(f"Indexed transcript of video {video_id} ({len(rows)} segments)")
+
+    def _match_fraction(self, patterns: List[str], sample_after: int) -> float:
+        """Estimate the fraction of segments matching a clause from the most recent ones."""
+        conn = self._connection()
+        sampled = conn.execute("SELECT count(*) FROM segments WHERE id > ?", (sample_after,)).fetchone()[0]
+        if sampled == 0:
+            return 0.0
+        matched = conn.execute(
+            "SELECT count(*) FROM segments_fts WHERE segments_fts MATCH ? AND rowid > ?",
+            (_fts_query([patterns]), sample_after),
+        ).fetchone()[0]
+        return matched / sampled
+
+    @staticmethod
+    def parse_query(query: str) -> List[List[str]]:
+        """
+        Parse a query into clauses, each a list of token patterns.
+
+        "quoted text" is a phrase, a trailing * makes a token a prefix match,
+        and every other word is its own clause.
+        """
+        clauses = []
+        for phrase, word in QUERY_RE.findall(query):
+            if phrase:
+                patterns = []
+                for raw in phrase.split():
+                    tokens = tokenize(raw)
+                    # Only the token the * is attached to is a prefix
+                    if raw.endswith("*") and tokens:
+                        tokens[-1] += "*"
+                    patterns.extend(tokens)
+                if patterns:
+                    clauses.append(patterns)
+            else:
+                tokens = tokenize(word)
+                if word.endswith("*") and tokens:
+                    tokens[-1] += "*"
+                clauses.extend([token] for token in tokens)
+        return clauses
+
+    def search(self, query: str, limit: int = 20, video_id: Optional[str] = None) -> List[dict]:
+        """
+        Find the segments where the query is spoken.
+
+        Segments matching any clause are ranked by bm25, so rare words and
+        segments that repeat them rank higher. Phrases match within a segment.
+        Clauses found in most segments do not affect the order and are not
+        scored, and when more than SEARCH_RANK_WINDOW segments match, only the
+        most recently indexed ones are ranked.
+
+        Args:
+            query: Search query
+            limit: Maximum number of hits to return
+            video_id: Only search the transcript of this video
+
+        Returns:
+            Ranked hits with the segment text and the exact times of each match
+        """
+        clauses = self.parse_query(query)
+        conn = self._connection()
+        total = conn.execute("SELECT sum(segment_count) FROM videos").fetchone()[0] or 0
+        last_id = conn.execute("SELECT max(id) FROM segments").fetchone()[0] or 0
+        # Number and last rowid of the segments searched
+        searched, searched_last = total, last_id
+        filters = ""
+        filter_params: list = []
+        if video_id is not None:
+            searched_first, searched_last, searched = conn.execute(
+                "SELECT first_id, last_id, segment_count FROM videos WHERE video_id = ?", (video_id,)
+            ).fetchone() or (None, None, 0)
+            if not searched:
+                return []
+            filters, filter_params = " AND rowid BETWEEN ? AND ?", [searched_first, searched_last]
+
+        # bm25 gives a clause found in half of all segments or more an idf of ~0,
+        # so when such a clause matches many segments only the rarer clauses are
+        # ranked; scoring all of its segments would take long without changing the order
+        sample_after = last_id - FREQUENCY_SAMPLE_SEGMENTS
+        ranked, common = [], []
+        ranked_fraction = 0.0
+        for patterns in clauses:
+            fraction = self._match_fraction(patterns, sample_after)
+            if fraction >= 0.5 and fraction * searched > config.SEARCH_RANK_WINDOW:
+                common.append(patterns)
+            else:
+                ranked.append(patterns)
+                ranked_fraction += fraction
+
+        # Rank inside the FTS table and fetch only the returned rows from the segments table
+        sql = (
+            "SELECT s.video_id, s.segment_id, s.text, s.seg_start, s.seg_end, s.tokens, s.token_times, hits.rank "
+            "FROM (SELECT rowid, {rank} AS rank FROM segments_fts WHERE segments_fts MATCH ?{filters} {order}LIMIT ?) "
+            "AS hits JOIN segments s ON s.id = hits.rowid ORDER BY hits.rank"
+        )
+        rows = []
+        if ranked:
+            ranked_filters, ranked_params = filters, filter_params
+            if ranked_fraction * searched > config.SEARCH_RANK_WINDOW:
+                # bm25 costs time per matching segment; rank only about a window of the most recent ones
+                ranked_filters += " AND rowid > ?"
+                ranked_params = filter_params + [searched_last - int(config.SEARCH_RANK_WINDOW / ranked_fraction)]
+            rows = conn.execute(
+                sql.format(rank="bm25(segments_fts)", filters=ranked_filters, order="ORDER BY rank "),
+                [_fts_query(ranked)] + ranked_params + [limit],
+            ).fetchall()
+        if common and len(rows) < limit:
+            # Segments matching only common clauses would score ~0; fill the remaining hits with any of them
+            common_query = f"({_fts_query(common)}) NOT ({_fts_query(ranked)})" if ranked else _fts_query(common)
+            rows += conn.execute(
+                sql.format(rank="0.0", filters=filters, order=""),
+                [common_query] + filter_params + [limit - len(rows)],
+            ).fetchall()
+
+        results = []
+        for vid, seg_id, text, seg_start, seg_end, tokens, token_times, rank in rows:
+            # Only the returned hits are expanded into match details
+            tokens = tokens.split(" ")
+            times = json.loads(token_times)
+            matches = [
+                {
+                    "start": times[p][0],
+                    "end": times[p + length - 1][1],
+                    "text": " ".join(tokens[p:p + length]),
+                }
+                for p, length in _match_spans(tokens, clauses)
+            ]
+            results.append({
+                "video_id": vid,
+                "segment_id": seg_id,
+                "text": text,
+                "segment_start": seg_start,
+                "segment_end": seg_end,
+                # Seek time of the first match in the segment
+                "start": matches[0]["start"] if matches else seg_start,
+                "end": matches[0]["end"] if matches else seg_end,
+                # bm25 ranks better matches lower
+                "score": round(-rank, 4) or 0.0,
+                "matches": matches,
+            })
+        return results
+
+_transcript_index: Optional[TranscriptIndex] = None
+
+def get_transcript_index() -> TranscriptIndex:
+    """Return the process-wide transcript index."""
+    global _transcript_index
+    if _transcript_index is None:
+        _transcript_index = TranscriptIndex(config.SEARCH_INDEX_PATH)
+    return _transcript_index
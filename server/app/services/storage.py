@@ -8,11 +8,35 @@ import logging
 import shutil
 from fastapi import UploadFile
 from fastapi.responses import FileResponse
-from typing import Union, Tuple
+import json
+import asyncio
+import time
+from typing import Union, Tuple, List, Optional
+
+from app.services.cache import get_video_cache
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
+def build_video_filename(video_id: str, original_filename: str) -> str:
+    """
+    Build the stored filename for a video.
+    
+    Args:
+        video_id: A unique identifier for the video
+        original_filename: Original filename from the user
+        
+    Returns:
+        Filename of the form ``video_<video_id>_<sanitized name><ext>``
+    """
+    # Get file extension
+    file_extension = os.path.splitext(original_filename)[1]
+    # Sanitize the original filename part
+    sanitized_original_filename = os.path.splitext(os.path.basename(original_filename))[0]
+    sanitized_original_filename = "".join(c if c.isalnum() or c in ('.', '-', '_') else '_' for c in sanitized_original_filename)
+    sanitized_original_filename = sanitized_original_filename[:50]  # Keep it reasonably short
+    return f"video_{video_id}_{sanitized_original_filename}{file_extension}"
+
 class StorageService(ABC):
     """Abstract base class for storage services."""
     
@@ -43,6 +67,95 @@ class StorageService(ABC):
             Tuple containing (file_path, content_type) if found, None otherwise
         """
         pass
+    
+    # Maximum number of chunks a single upload session may use (None = unlimited)
+    max_upload_chunks: Optional[int] = None
+    
+    @abstractmethod
+    async def create_upload_session(self, manifest: dict) -> None:
+        """
+        Prepare storage for a chunked upload and persist its manifest.
+        
+        Args:
+            manifest: Session description (upload_id, video_id, filename,
+                content_type, total_size, chunk_size, chunk_count)
+        """
+        pass
+    
+    @abstractmethod
+    async def get_upload_session(self, upload_id: str) -> Optional[dict]:
+        """
+        Load the manifest of an upload session.
+        
+        Args:
+            upload_id: The upload session identifier
+            
+        Returns:
+            The session manifest if found, None otherwise
+        """
+        pass
+    
+    @abstractmethod
+    async def write_chunk(self, manifest: dict, index: int, offset: int, data: bytes) -> None:
+        """
+        Durably store one chunk of an upload session.
+        
+        Args:
+            manifest: The session manifest
+            index: Zero-based chunk index
+            offset: Byte offset of the chunk within the final file
+            data: Chunk contents
+        """
+        pass
+    
+    @abstractmethod
+    async def list_chunks(self, upload_id: str) -> List[int]:
+        """
+        List the chunk indexes already stored for an upload session.
+        
+        Args:
+            upload_id: The upload session identifier
+            
+        Returns:
+            Sorted list of stored chunk indexes
+        """
+        pass
+    
+    @abstractmethod
+    async def complete_upload_session(self, manifest: dict) -> str:
+        """
+        Assemble all stored chunks into the final video and drop the session.
+        
+        Args:
+            manifest: The session manifest
+            
+        Returns:
+            The path where the video was saved
+        """
+        pass
+    
+    @abstractmethod
+    async def delete_upload_session(self, upload_id: str) -> None:
+        """
+        Discard an upload session and any chunks stored for it.
+        
+        Args:
+            upload_id: The upload session identifier
+        """
+        pass
+
+    @abstractmethod
+    async def expire_upload_sessions(self, max_idle: float) -> int:
+        """
+        Discard upload sessions that have not received a chunk for a while.
+        
+        Args:
+            max_idle: Seconds since the last activity after which a session is abandoned
+            
+        Returns:
+            Number of sessions removed
+        """
+        pass
 
 class LocalStorageService(StorageService):
     """Service for storing files on the local filesystem."""
@@ -61,15 +174,8 @@ class LocalStorageService(StorageService):
     async def save_video(self, file: UploadFile, video_id: str, original_filename: str) -> str:
         """Save video to local filesystem."""
         try:
-            # Get file extension
-            file_extension = os.path.splitext(original_filename)[1]
-            # Sanitize the original filename part
-            sanitized_original_filename = os.path.splitext(os.path.basename(original_filename))[0]
-            sanitized_original_filename = "".join(c if c.isalnum() or c in ('.', '-', '_') else '_' for c in sanitized_original_filename)
-            sanitized_original_filename = sanitized_original_filename[:50]  # Keep it reasonably short
-            
             # Create filename with video_id and sanitized original filename
-            video_filename = f"video_{video_id}_{sanitized_original_filename}{file_extension}"
+            video_filename = build_video_filename(video_id, original_filename)
             file_path = os.path.join(self.storage_path, video_filename)
             
             # Save the file
@@ -110,6 +216,108 @@ class LocalStorageService(StorageService):
             logger.error(f"Error retrieving video {video_id} from local storage: {e}", exc_info=True)
             raise
 
+    def _session_dir(self, upload_id: str) -> str:
+        return os.path.join(self.storage_path, "sessions", upload_id)
+    
+    async def create_upload_session(self, manifest: dict) -> None:
+        """Preallocate the target file and write the session manifest."""
+        session_dir = self._session_dir(manifest["upload_id"])
+        
+        def _create():
+            os.makedirs(os.path.join(session_dir, "chunks"), exist_ok=True)
+            # Preallocate the full file so chunks can be written in place at their offsets
+            with open(os.path.join(session_dir, "data.part"), "wb") as part_file:
+                if hasattr(os, "posix_fallocate"):
+                    os.posix_fallocate(part_file.fileno(), 0, manifest["total_size"])
+                else:
+                    part_file.truncate(manifest["total_size"])
+            with open(os.path.join(session_dir, "manifest.json"), "w") as manifest_file:
+                json.dump(manifest, manifest_file)
+        
+        try:
+            await asyncio.to_thread(_create)
+            logger.info(f"Created local upload session {manifest['upload_id']} ({manifest['total_size']} bytes)")
+        except Exception as e:
+            logger.error(f"Error creating local upload session: {e}", exc_info=True)
+            shutil.rmtree(session_dir, ignore_errors=True)
+            raise
+    
+    async def get_upload_session(self, upload_id: str) -> Optional[dict]:
+        """Read the session manifest from the local filesystem."""
+        manifest_path = os.path.join(self._session_dir(upload_id), "manifest.json")
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path) as manifest_file:
+            return json.load(manifest_file)
+    
+    async def write_chunk(self, manifest: dict, index: int, offset: int, data: bytes) -> None:
+        """Write a chunk in place into the preallocated file."""
+        session_dir = self._session_dir(manifest["upload_id"])
+        
+        def _write():
+            with open(os.path.join(session_dir, "data.part"), "r+b") as part_file:
+                part_file.seek(offset)
+                part_file.write(data)
+                part_file.flush()
+                os.fsync(part_file.fileno())
+            # The marker is only created once the data is on disk
+            open(os.path.join(session_dir, "chunks", str(index)), "w").close()
+        
+        await asyncio.to_thread(_write)
+    
+    async def list_chunks(self, upload_id: str) -> List[int]:
+        """List chunk markers of a local upload session."""
+        chunks_dir = os.path.join(self._session_dir(upload_id), "chunks")
+        if not os.path.isdir(chunks_dir):
+            return []
+        return sorted(int(name) for name in os.listdir(chunks_dir) if name.isdigit())
+    
+    async def complete_upload_session(self, manifest: dict) -> str:
+        """Move the assembled file into place without copying it."""
+        session_dir = self._session_dir(manifest["upload_id"])
+        video_filename = build_video_filename(manifest["video_id"], manifest["filename"])
+        file_path = os.path.join(self.storage_path, video_filename)
+        try:
+            os.replace(os.path.join(session_dir, "data.part"), file_path)
+            shutil.rmtree(session_dir, ignore_errors=True)
+            logger.info(f"Upload session {manifest['upload_id']} completed locally as '{video_filename}'")
+            return file_path
+        except Exception as e:
+            logger.error(f"Error completing local upload session: {e}", exc_info=True)
+            raise
+    
+    async def delete_upload_session(self, upload_id: str) -> None:
+        """Remove a local upload session directory."""
+        shutil.rmtree(self._session_dir(upload_id), ignore_errors=True)
+        logger.info(f"Deleted local upload session {upload_id}")
+    
+    async def expire_upload_sessions(self, max_idle: float) -> int:
+        """Remove local upload session directories that have been idle too long."""
+        sessions_dir = os.path.join(self.storage_path, "sessions")
+        
+        def _expire():
+            removed = 0
+            if not os.path.isdir(sessions_dir):
+                return removed
+            now = time.time()
+            for upload_id in os.listdir(sessions_dir):
+                session_dir = self._session_dir(upload_id)
+                try:
+                    with open(os.path.join(session_dir, "manifest.json")) as manifest_file:
+                        last_activity = json.load(manifest_file)["created_at"]
+                except (OSError, ValueError, KeyError):
+                    last_activity = os.path.getmtime(session_dir)
+                chunks_dir = os.path.join(session_dir, "chunks")
+                if os.path.isdir(chunks_dir):
+                    # The chunks directory changes whenever a chunk is stored
+                    last_activity = max(last_activity, os.path.getmtime(chunks_dir))
+                if now - last_activity > max_idle:
+                    shutil.rmtree(session_dir, ignore_errors=True)
+                    removed += 1
+            return removed
+        
+        return await asyncio.to_thread(_expire)
+
 class GCSStorageService(StorageService):
     """Service for storing files on Google Cloud Storage."""
     
@@ -135,15 +343,8 @@ class GCSStorageService(StorageService):
     async def save_video(self, file: UploadFile, video_id: str, original_filename: str) -> str:
         """Save video to Google Cloud Storage."""
         try:
-            # Get file extension
-            file_extension = os.path.splitext(original_filename)[1]
-            # Sanitize the original filename part
-            sanitized_original_filename = os.path.splitext(os.path.basename(original_filename))[0]
-            sanitized_original_filename = "".join(c if c.isalnum() or c in ('.', '-', '_') else '_' for c in sanitized_original_filename)
-            sanitized_original_filename = sanitized_original_filename[:50]  # Keep it reasonably short
-            
             # Create filename with video_id and sanitized original filename
-            video_filename = f"video_{video_id}_{sanitized_original_filename}{file_extension}"
+            video_filename = build_video_filename(video_id, original_filename)
             
             # Upload to GCS
             blob = self.bucket.blob(f"videos/{video_filename}")
@@ -160,9 +361,6 @@ class GCSStorageService(StorageService):
     async def get_video(self, video_id: str) -> Union[Tuple[str, str], None]:
         """Retrieve video from Google Cloud Storage."""
         try:
-            import tempfile
-            from google.cloud import storage
-            
             logger.info(f"Attempting to find video with ID: {video_id} in GCS")
             # Construct the expected prefix for the video file
             file_prefix = f"video_{video_id}_"
@@ -178,13 +376,12 @@ class GCSStorageService(StorageService):
             blob = blobs[0]
             filename = os.path.basename(blob.name)
             
-            # Create a temporary file to store the downloaded content
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1])
-            temp_file_path = temp_file.name
-            temp_file.close()
-            
-            # Download the blob to the temporary file
-            blob.download_to_filename(temp_file_path)
+            # Serve from the local cache, downloading the blob only on a miss
+            cached_path = await get_video_cache().get_or_fetch(
+                f"{blob.name}#{blob.generation}",
+                blob.download_to_filename,
+                suffix=os.path.splitext(filename)[1],
+            )
             
             # Infer content type based on extension or use the blob's content type
             content_type = blob.content_type
@@ -197,13 +394,122 @@ class GCSStorageService(StorageService):
                 elif filename.lower().endswith('.webm'):
                     content_type = 'video/webm'
             
-            logger.info(f"Downloaded video from GCS to temporary file: {temp_file_path}")
-            return temp_file_path, content_type
+            logger.info(f"Serving GCS video from cache file: {cached_path}")
+            return cached_path, content_type
             
         except Exception as e:
             logger.error(f"Error retrieving video {video_id} from GCS: {e}", exc_info=True)
             raise
 
+    # GCS limits a composite object to 1024 components
+    max_upload_chunks = 1024
+    
+    # GCS compose accepts at most 32 source objects per request
+    COMPOSE_BATCH_SIZE = 32
+    
+    def _session_prefix(self, upload_id: str) -> str:
+        return f"uploads/{upload_id}/"
+    
+    def _chunk_blob_name(self, upload_id: str, index: int) -> str:
+        return f"{self._session_prefix(upload_id)}chunks/{index:08d}"
+    
+    async def create_upload_session(self, manifest: dict) -> None:
+        """Write the session manifest next to where the chunks will be stored."""
+        try:
+            blob = self.bucket.blob(f"{self._session_prefix(manifest['upload_id'])}manifest.json")
+            await asyncio.to_thread(
+                blob.upload_from_string, json.dumps(manifest), content_type="application/json"
+            )
+            logger.info(f"Created GCS upload session {manifest['upload_id']} ({manifest['total_size']} bytes)")
+        except Exception as e:
+            logger.error(f"Error creating GCS upload session: {e}", exc_info=True)
+            raise
+    
+    async def get_upload_session(self, upload_id: str) -> Optional[dict]:
+        """Read the session manifest from GCS."""
+        from google.api_core.exceptions import NotFound
+        
+        blob = self.bucket.blob(f"{self._session_prefix(upload_id)}manifest.json")
+        try:
+            return json.loads(await asyncio.to_thread(blob.download_as_bytes))
+        except NotFound:
+            return None
+    
+    async def write_chunk(self, manifest: dict, index: int, offset: int, data: bytes) -> None:
+        """Upload a chunk as its own object; chunks are composed on completion."""
+        blob = self.bucket.blob(self._chunk_blob_name(manifest["upload_id"], index))
+        await asyncio.to_thread(blob.upload_from_string, data, content_type="application/octet-stream")
+    
+    async def list_chunks(self, upload_id: str) -> List[int]:
+        """List chunk objects of a GCS upload session."""
+        prefix = f"{self._session_prefix(upload_id)}chunks/"
+        blobs = await asyncio.to_thread(lambda: list(self.bucket.list_blobs(prefix=prefix)))
+        return sorted(int(blob.name[len(prefix):]) for blob in blobs)
+    
+    async def complete_upload_session(self, manifest: dict) -> str:
+        """Compose the chunk objects server-side into the final video object."""
+        upload_id = manifest["upload_id"]
+        video_filename = build_video_filename(manifest["video_id"], manifest["filename"])
+        
+        def _compose():
+            sources = [self.bucket.blob(self._chunk_blob_name(upload_id, i)) for i in range(manifest["chunk_count"])]
+            # Compose in rounds until the remaining sources fit in a single request
+            level = 0
+            while len(sources) > self.COMPOSE_BATCH_SIZE:
+                next_sources = []
+                for n, start in enumerate(range(0, len(sources), self.COMPOSE_BATCH_SIZE)):
+                    target = self.bucket.blob(f"{self._session_prefix(upload_id)}compose/{level:02d}_{n:06d}")
+                    target.compose(sources[start:start + self.COMPOSE_BATCH_SIZE])
+                    next_sources.append(target)
+                sources = next_sources
+                level += 1
+            
+            final_blob = self.bucket.blob(f"videos/{video_filename}")
+            final_blob.content_type = manifest.get("content_type") or "application/octet-stream"
+            final_blob.compose(sources)
+        
+        try:
+            await asyncio.to_thread(_compose)
+            await self.delete_upload_session(upload_id)
+            gcs_path = f"gs://{self.bucket.name}/videos/{video_filename}"
+            logger.info(f"Upload session {upload_id} composed in GCS as '{gcs_path}'")
+            return gcs_path
+        except Exception as e:
+            logger.error(f"Error completing GCS upload session: {e}", exc_info=True)
+            raise
+    
+    async def delete_upload_session(self, upload_id: str) -> None:
+        """Delete the manifest, chunks and intermediate objects of a GCS upload session."""
+        def _delete():
+            blobs = list(self.bucket.list_blobs(prefix=self._session_prefix(upload_id)))
+            if blobs:
+                # Objects already removed by another worker's janitor are skipped
+                self.bucket.delete_blobs(blobs, on_error=lambda blob: None)
+        
+        await asyncio.to_thread(_delete)
+        logger.info(f"Deleted GCS upload session {upload_id}")
+    
+    async def expire_upload_sessions(self, max_idle: float) -> int:
+        """Delete the objects of GCS upload sessions that have been idle too long."""
+        def _expire():
+            # upload_id -> (objects, time of the most recent write)
+            sessions = {}
+            for blob in self.bucket.list_blobs(prefix="uploads/"):
+                upload_id = blob.name.split("/")[1]
+                blobs, last_activity = sessions.get(upload_id, ([], 0.0))
+                blobs.append(blob)
+                sessions[upload_id] = (blobs, max(last_activity, blob.updated.timestamp()))
+            now = time.time()
+            removed = 0
+            for upload_id, (blobs, last_activity) in sessions.items():
+                if now - last_activity > max_idle:
+                    # The session may be completed or expired by another worker meanwhile
+                    self.bucket.delete_blobs(blobs, on_error=lambda blob: None)
+                    removed += 1
+            return removed
+        
+        return await asyncio.to_thread(_expire)
+
 def get_storage_service() -> StorageService:
     """
     Factory function to get the appropriate storage service based on configuration.
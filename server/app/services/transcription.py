@@ -0,0 +1,254 @@
+"""
+WhisperX model management and the transcribe + align pipeline.
+
+Models are cached in module globals of whichever process runs inference:
+the API worker itself, or a dedicated model server (see model_server.py).
+"""
+import logging
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+import whisperx
+from fastapi import HTTPException
+
+import config
+from app.services.audio import SAMPLE_RATE, offset_segments
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+# Whisper detects the language from its first 30 seconds of input
+LANGUAGE_SAMPLE_SECONDS = 30
+# Frame length of the energy-based voice activity detection for the language sample
+VAD_FRAME_SECONDS = 0.5
+
+# Caches for models
+asr_model = None
+align_models = {}
+# Models are loaded from several threads (the alignment thread of a pipelined run,
+# the inference thread); without the lock two cold callers would each load a copy
+_model_lock = threading.Lock()
+
+def load_asr_model(model_name: str, device: str, compute_type: str):
+    global asr_model
+    if asr_model is not None:
+        return asr_model
+    with _model_lock:
+        if asr_model is not None:
+            return asr_model
+        try:
+            logger.info(f"Loading ASR model: {model_name} ({compute_type}) on {device}")
+            asr_model = whisperx.load_model(
+                model_name,
+                device,
+                compute_type=compute_type,
+                multilingual=None,
+                max_new_tokens=None,
+                clip_timestamps="0",
+                hallucination_silence_threshold=None,
+                hotwords=None
+            )
+            return asr_model
+        except Exception as e:
+            logger.error(f"Failed to load ASR model: {e}")
+            raise HTTPException(status_code=500, detail="Could not load ASR model")
+
+def get_align_model(language_code: str, align_model: Optional[str] = None):
+    global align_models
+    model_key = f"{language_code}_{align_model if align_model else 'default'}"
+    if model_key in align_models:
+        return align_models[model_key]
+    with _model_lock:
+        if model_key in align_models:
+            return align_models[model_key]
+        try:
+            logger.info(f"Loading alignment model for language: {language_code}" +
+                      (f" using model: {align_model}" if align_model else ""))
+            model_a, metadata = whisperx.load_align_model(
+                language_code=language_code,
+                device=config.DEVICE,
+                model_name=align_model
+            )
+            align_models[model_key] = (model_a, metadata)
+            return model_a, metadata
+        except Exception as e:
+            logger.error(f"Failed to load alignment model: {e}")
+            raise HTTPException(status_code=500, detail="Could not load alignment model")
+
+def run_transcription(
+    audio: np.ndarray,
+    model_name: str = config.ASR_MODEL_NAME,
+    compute_type: str = config.COMPUTE_TYPE,
+    language: Optional[str] = None,
+    batch_size: int = 8,
+    align_model: Optional[str] = None,
+    vad_parameters: Optional[dict] = None,
+) -> dict:
+    """
+    Transcribe decoded audio and align it for word-level timestamps.
+
+    Args:
+        audio: 16 kHz mono float32 samples
+        model_name: ASR model name
+        compute_type: ASR compute type
+        language: Language code, detected when None
+        batch_size: ASR batch size
+        align_model: Optional alignment model name
+        vad_parameters: Extra VAD options passed to the ASR model
+
+    Returns:
+        Dictionary with the aligned "segments" and the "language" code
+    """
+    asr = load_asr_model(model_name, config.DEVICE, compute_type)
+    result = asr.transcribe(audio, batch_size=batch_size, language=language, **(vad_parameters or {}))
+    language_code = result.get("language")
+
+    # Align for word-level timestamps
+    model_a, metadata = get_align_model(language_code, align_model)
+    result = whisperx.align(
+        result.get("segments", []),
+        model_a,
+        metadata,
+        audio,
+        config.DEVICE,
+        return_char_alignments=False,
+    )
+    return {"segments": result.get("segments", []), "language": language_code}
+
+def select_speech_sample(audio: np.ndarray, seconds: float = LANGUAGE_SAMPLE_SECONDS) -> np.ndarray:
+    """
+    Pick up to `seconds` of voiced audio for language detection.
+
+    Frames whose energy is well above the noise floor are concatenated in
+    order, so intros of silence or music do not decide the language.
+
+    Args:
+        audio: 16 kHz mono float32 samples
+        seconds: Length of the sample
+
+    Returns:
+        The selected samples
+    """
+    frame = int(VAD_FRAME_SECONDS * SAMPLE_RATE)
+    n_frames = len(audio) // frame
+    if n_frames == 0:
+        return audio
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    noise_floor, loud = np.percentile(rms, [10, 95])
+    voiced = frames[rms > noise_floor + 0.25 * (loud - noise_floor)]
+    if len(voiced) == 0:
+        return audio[:int(seconds * SAMPLE_RATE)]
+    return voiced[:int(seconds / VAD_FRAME_SECONDS)].reshape(-1)
+
+def _prefetch(windows: Iterator[Tuple[float, np.ndarray]]) -> Iterator[Tuple[float, np.ndarray]]:
+    """Produce the next window in a background thread while the current one is processed."""
+    buffer: "queue.Queue" = queue.Queue(maxsize=1)
+    stop = threading.Event()
+    done = object()
+
+    def put(item) -> bool:
+        # Give up once the consumer has stopped so this thread never blocks forever
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in windows:
+                if not put(item):
+                    break
+            else:
+                put(done)
+        except Exception as e:
+            put(e)
+        finally:
+            if stop.is_set() and hasattr(windows, "close"):
+                windows.close()
+
+    threading.Thread(target=produce, name="audio-prefetch", daemon=True).start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+def _align_window(model_future: Future, segments: List[dict], audio: np.ndarray, offset: float) -> Tuple[float, List[dict]]:
+    model_a, metadata = model_future.result()
+    result = whisperx.align(segments, model_a, metadata, audio, config.DEVICE, return_char_alignments=False)
+    return offset, result.get("segments", [])
+
+def run_pipelined_transcription(
+    windows: Iterator[Tuple[float, np.ndarray]],
+    model_name: str = config.ASR_MODEL_NAME,
+    compute_type: str = config.COMPUTE_TYPE,
+    language: Optional[str] = None,
+    batch_size: int = 8,
+    align_model: Optional[str] = None,
+    vad_parameters: Optional[dict] = None,
+) -> dict:
+    """
+    Transcribe and align audio windows with the stages overlapped.
+
+    The language is detected on a voiced sample of the first window, so the
+    alignment model starts loading while ASR runs. Each window is aligned in
+    a background thread while ASR works on the next one, and the next window
+    is decoded meanwhile. At most one window waits for alignment at a time.
+
+    Args:
+        windows: (offset_seconds, samples) windows in recording order
+        model_name: ASR model name
+        compute_type: ASR compute type
+        language: Language code, detected when None
+        batch_size: ASR batch size
+        align_model: Optional alignment model name
+        vad_parameters: Extra VAD options passed to the ASR model
+
+    Returns:
+        Dictionary with the aligned "segments" and the "language" code
+    """
+    asr = load_asr_model(model_name, config.DEVICE, compute_type)
+    segments: List[dict] = []
+    pending: deque = deque()
+    model_future: Optional[Future] = None
+
+    def collect():
+        offset, aligned = pending.popleft().result()
+        segments.extend(offset_segments(aligned, offset, len(segments)))
+
+    prefetched = _prefetch(windows)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="align") as aligner:
+        try:
+            for offset, audio in prefetched:
+                if language is None:
+                    language = asr.detect_language(select_speech_sample(audio))
+                    logger.info(f"Detected language: {language}")
+                if model_future is None:
+                    # Load the alignment model while ASR runs; align jobs queue behind it
+                    model_future = aligner.submit(get_align_model, language, align_model)
+
+                result = asr.transcribe(audio, batch_size=batch_size, language=language, **(vad_parameters or {}))
+                pending.append(aligner.submit(_align_window, model_future, result.get("segments", []), audio, offset))
+                del audio, result
+                while len(pending) > 1:
+                    collect()
+        finally:
+            # Also stops the decoder thread when ASR or alignment fails
+            prefetched.close()
+        while pending:
+            collect()
+
+    return {"segments": segments, "language": language}
@@ -0,0 +1,191 @@
+"""
+Resumable chunked upload sessions.
+
+A client creates a session for a file of known size, uploads fixed-size
+chunks (in any order and in parallel) with a SHA-256 checksum each, can ask
+which chunks are already stored after a dropped connection, and finally
+completes the session. Chunk storage and assembly are delegated to the
+configured StorageService.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import time
+import uuid
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+
+import config
+from app.services.storage import StorageService
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+
+def chunk_range(manifest: dict, index: int) -> Tuple[int, int]:
+    """
+    Compute the byte range covered by a chunk.
+
+    Args:
+        manifest: The session manifest
+        index: Zero-based chunk index
+
+    Returns:
+        Tuple containing (offset, size) of the chunk
+    """
+    offset = index * manifest["chunk_size"]
+    size = min(manifest["chunk_size"], manifest["total_size"] - offset)
+    return offset, size
+
+def stored_ranges(manifest: dict, indexes: List[int]) -> List[List[int]]:
+    """Merge stored chunk indexes into contiguous [start, end) byte ranges."""
+    ranges: List[List[int]] = []
+    for index in indexes:
+        offset, size = chunk_range(manifest, index)
+        if ranges and ranges[-1][1] == offset:
+            ranges[-1][1] = offset + size
+        else:
+            ranges.append([offset, offset + size])
+    return ranges
+
+async def load_session(storage: StorageService, upload_id: str) -> dict:
+    """
+    Load a session manifest, raising 404 if it does not exist.
+
+    Args:
+        storage: The storage service holding the session
+        upload_id: The upload session identifier
+
+    Returns:
+        The session manifest
+    """
+    try:
+        # Upload IDs are used in paths and object names, so only accept UUIDs
+        upload_id = str(uuid.UUID(upload_id))
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    manifest = await storage.get_upload_session(upload_id)
+    if manifest is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return manifest
+
+async def create_session(
+    storage: StorageService,
+    filename: str,
+    total_size: int,
+    content_type: Optional[str] = None,
+    chunk_size: Optional[int] = None,
+) -> dict:
+    """
+    Create a new upload session.
+
+    The chunk size requested by the client is honoured when possible but may be
+    raised to UPLOAD_MIN_CHUNK_SIZE, or so the file fits within the chunk limit
+    of the server and the storage backend.
+
+    Args:
+        storage: The storage service to upload into
+        filename: Original filename from the user
+        total_size: Size of the complete file in bytes
+        content_type: MIME type of the file
+        chunk_size: Requested chunk size in bytes
+
+    Returns:
+        The session manifest
+    """
+    if total_size <= 0:
+        raise HTTPException(status_code=400, detail="total_size must be positive")
+    if total_size > config.UPLOAD_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"File exceeds the upload limit of {config.UPLOAD_MAX_SIZE} bytes")
+
+    # Bound the chunk count: status and completion walk every chunk, and local storage keeps a marker per chunk
+    max_chunks = min(config.UPLOAD_MAX_CHUNKS, storage.max_upload_chunks or config.UPLOAD_MAX_CHUNKS)
+    chunk_size = max(chunk_size or config.UPLOAD_CHUNK_SIZE, config.UPLOAD_MIN_CHUNK_SIZE, math.ceil(total_size / max_chunks))
+    if chunk_size > config.UPLOAD_MAX_CHUNK_SIZE:
+        raise HTTPException(status_code=400, detail="Unsupported chunk size for this file")
+
+    manifest = {
+        "upload_id": str(uuid.uuid4()),
+        "video_id": str(uuid.uuid4()),
+        "filename": filename,
+        "content_type": content_type,
+        "total_size": total_size,
+        "chunk_size": chunk_size,
+        "chunk_count": math.ceil(total_size / chunk_size),
+        "created_at": time.time(),
+    }
+    await storage.create_upload_session(manifest)
+    return manifest
+
+async def put_chunk(storage: StorageService, manifest: dict, index: int, data: bytes, checksum: str) -> dict:
+    """
+    Verify and store one chunk.
+
+    Args:
+        storage: The storage service holding the session
+        manifest: The session manifest
+        index: Zero-based chunk index
+        data: Chunk contents
+        checksum: Hex encoded SHA-256 of the chunk sent by the client
+
+    Returns:
+        Dictionary describing the stored chunk
+    """
+    if index < 0 or index >= manifest["chunk_count"]:
+        raise HTTPException(status_code=400, detail="Chunk index out of range")
+
+    offset, size = chunk_range(manifest, index)
+    if len(data) != size:
+        raise HTTPException(status_code=400, detail=f"Chunk {index} must be exactly {size} bytes")
+
+    # Hashing a chunk of up to UPLOAD_MAX_CHUNK_SIZE bytes must not block the event loop
+    digest = await asyncio.to_thread(lambda: hashlib.sha256(data).hexdigest())
+    if digest != checksum.strip().lower():
+        logger.warning(f"Checksum mismatch for chunk {index} of upload {manifest['upload_id']}")
+        raise HTTPException(status_code=422, detail="Chunk checksum mismatch")
+
+    await storage.write_chunk(manifest, index, offset, data)
+    return {"index": index, "offset": offset, "size": size}
+
+async def session_status(storage: StorageService, manifest: dict) -> dict:
+    """
+    Report which parts of the file are already stored.
+
+    Args:
+        storage: The storage service holding the session
+        manifest: The session manifest
+
+    Returns:
+        Dictionary with stored and missing chunks and byte ranges
+    """
+    received = await storage.list_chunks(manifest["upload_id"])
+    received_set = set(received)
+    return {
+        "upload_id": manifest["upload_id"],
+        "video_id": manifest["video_id"],
+        "total_size": manifest["total_size"],
+        "chunk_size": manifest["chunk_size"],
+        "chunk_count": manifest["chunk_count"],
+        "received_chunks": received,
+        "missing_chunks": [i for i in range(manifest["chunk_count"]) if i not in received_set],
+        "stored_ranges": stored_ranges(manifest, received),
+        "bytes_received": sum(chunk_range(manifest, i)[1] for i in received),
+    }
+
+async def complete_session(storage: StorageService, manifest: dict) -> str:
+    """
+    Assemble a fully uploaded session into the final video.
+
+    Args:
+        storage: The storage service holding the session
+        manifest: The session manifest
+
+    Returns:
+        The path where the video was saved
+    """
+    received = set(await storage.list_chunks(manifest["upload_id"]))
+    missing = [i for i in range(manifest["chunk_count"]) if i not in received]
+    if missing:
+        raise HTTPException(status_code=409, detail=f"Upload incomplete: {len(missing)} chunk(s) missing")
+    return await storage.complete_upload_session(manifest)
@@ -10,11 +10,35 @@ BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 # Directory to save uploaded files
 UPLOAD_DIR = os.path.join(BASE_DIR, "uploads")
 
+# Directory for short-lived files such as uploads being transcribed
+TEMP_DIR = os.path.join(UPLOAD_DIR, "tmp")
+
 # Storage configuration
 # Values: "local" or "gcs" (Google Cloud Storage)
 STORAGE_TYPE = os.getenv("STORAGE_TYPE", "local").lower()
 GCS_BUCKET_NAME = os.getenv("GCS_BUCKET_NAME", "")
 
+# Chunked (resumable) upload configuration
+# Default and maximum chunk size accepted by the upload session endpoints
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+UPLOAD_MAX_CHUNK_SIZE = int(os.getenv("UPLOAD_MAX_CHUNK_SIZE", str(64 * 1024 * 1024)))
+# Every chunk but the last is at least this large, and a session has at most UPLOAD_MAX_CHUNKS chunks
+UPLOAD_MIN_CHUNK_SIZE = int(os.getenv("UPLOAD_MIN_CHUNK_SIZE", str(1024 * 1024)))
+UPLOAD_MAX_CHUNKS = int(os.getenv("UPLOAD_MAX_CHUNKS", "10000"))
+# Largest file a session may declare; its storage is preallocated up front
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", str(10 * 1024 ** 3)))
+
+# Local disk cache for videos read from remote storage
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(BASE_DIR, "cache"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(10 * 1024 ** 3)))
+# Recently served cache entries are kept even when over budget
+CACHE_EVICTION_GRACE_SECONDS = float(os.getenv("CACHE_EVICTION_GRACE_SECONDS", "60"))
+
+# Janitor that reclaims orphaned temporary files and abandoned upload sessions
+JANITOR_INTERVAL_SECONDS = float(os.getenv("JANITOR_INTERVAL_SECONDS", "600"))
+TEMP_FILE_TTL_SECONDS = float(os.getenv("TEMP_FILE_TTL_SECONDS", str(24 * 3600)))
+UPLOAD_SESSION_TTL_SECONDS = float(os.getenv("UPLOAD_SESSION_TTL_SECONDS", str(24 * 3600)))
+
 # Determine default compute device and type
 DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
 COMPUTE_TYPE = "float32"
@@ -22,5 +46,34 @@ COMPUTE_TYPE = "float32"
 # Default ASR model name
 ASR_MODEL_NAME = "medium"
 
+# Streaming audio decode: audio is processed in windows of at most this many seconds,
+# which bounds memory per request (16 kHz float32 is about 3.8 MB per minute)
+STREAM_WINDOW_SECONDS = float(os.getenv("STREAM_WINDOW_SECONDS", "600"))
+# Windows are cut at the quietest point within this many seconds of their end
+STREAM_SPLIT_SEARCH_SECONDS = float(os.getenv("STREAM_SPLIT_SEARCH_SECONDS", "10"))
+
+# Pipelined transcription: overlap decoding, ASR, alignment-model loading and alignment.
+# Used when a request does not set `pipelined`; smaller windows let alignment start sooner.
+PIPELINED_TRANSCRIPTION = os.getenv("PIPELINED_TRANSCRIPTION", "false").lower() in ("1", "true", "yes")
+PIPELINE_WINDOW_SECONDS = float(os.getenv("PIPELINE_WINDOW_SECONDS", "120"))
+
+# Transcript search index (SQLite FTS5 database shared by all workers)
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", os.path.join(BASE_DIR, "search", "transcripts.db"))
+# Roughly the most matching segments bm25 scores per query; broader queries rank the most recent ones
+SEARCH_RANK_WINDOW = int(os.getenv("SEARCH_RANK_WINDOW", "2000"))
+
+# Inference backend
+# Values: "local" (models loaded in each API worker) or "server" (shared model server processes)
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "local").lower()
+# Number of model server processes; server i listens on f"{INFERENCE_SOCKET}.{i}"
+INFERENCE_SERVERS = int(os.getenv("INFERENCE_SERVERS", "1"))
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET", os.path.join(BASE_DIR, "inference.sock"))
+# Shared secret of API workers and model servers; required with INFERENCE_MODE=server
+INFERENCE_AUTHKEY = os.getenv("INFERENCE_AUTHKEY", "").encode()
+# Seconds to connect and authenticate to a model server before answering 503
+INFERENCE_CONNECT_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_CONNECT_TIMEOUT_SECONDS", "10"))
+# Seconds to wait for each reply of a model server, including time queued behind other requests
+INFERENCE_REPLY_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_REPLY_TIMEOUT_SECONDS", "3600"))
+
 # CORS origins allowed
 ALLOWED_ORIGINS = ["http://localhost:3000"]
\ No newline at end of file
@@ -1,10 +1,13 @@
 import os
+import asyncio
 import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 import config
-from app.routes import transcribe_router, upload_router, video_router
+from app.routes import transcribe_router, upload_router, video_router, search_router
+from app.services.inference import inference_authkey
+from app.services.janitor import run_janitor
 
 # Configure logging
 logging.basicConfig(
@@ -27,11 +30,29 @@ app.add_middleware(
 
 # Ensure upload directory exists
 os.makedirs(config.UPLOAD_DIR, exist_ok=True)
+os.makedirs(config.TEMP_DIR, exist_ok=True)
 logger.info(f"Upload directory: {config.UPLOAD_DIR}")
 
+@app.on_event("startup")
+async def check_inference_config():
+    # Refuse to start without the key the model servers expect
+    if config.INFERENCE_MODE == "server":
+        inference_authkey()
+
+@app.on_event("startup")
+async def start_janitor():
+    # Periodically reclaim orphaned temp files, upload sessions and cache downloads
+    app.state.janitor_task = asyncio.create_task(run_janitor())
+
+@app.on_event("shutdown")
+async def stop_janitor():
+    app.state.janitor_task.cancel()
+
 # Include transcription routes
 app.include_router(transcribe_router)
 # Include upload routes
 app.include_router(upload_router)
 # Include video routes
-app.include_router(video_router)
\ No newline at end of file
+app.include_router(video_router)
+# Include search routes
+app.include_router(search_router)
\ No newline at end of file
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Model server for INFERENCE_MODE=server.
+
+Holds the WhisperX ASR and alignment models and serves transcription
+requests from the API workers over a Unix socket. Audio is read from the
+shared memory block named in each request; pipelined requests stream one
+block per window over the same connection.
+
+Usage:
+    python model_server.py --index 0
+"""
+import argparse
+import logging
+import os
+import queue
+import threading
+from multiprocessing import AuthenticationError, resource_tracker
+from multiprocessing.connection import Listener
+from multiprocessing.shared_memory import SharedMemory
+from typing import Iterator, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+
+import config
+from app.services.inference import inference_authkey, server_addresses
+from app.services.transcription import load_asr_model, run_pipelined_transcription, run_transcription
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+def read_audio(message: dict) -> np.ndarray:
+    """Copy the samples out of the shared memory block named in a message."""
+    shm = SharedMemory(name=message["shm"])
+    # The API worker owns the block; keep this process's tracker from unlinking it
+    resource_tracker.unregister(shm._name, "shared_memory")
+    try:
+        view = np.ndarray(message["shape"], dtype=np.dtype(message["dtype"]), buffer=shm.buf)
+        audio = view.copy()
+        # The block cannot be closed while an array still exports its buffer
+        del view
+        return audio
+    finally:
+        shm.close()
+
+def receive_windows(conn, send_lock: threading.Lock) -> Iterator[Tuple[float, np.ndarray]]:
+    """Yield the windows of a pipelined request, acknowledging each once copied."""
+    while True:
+        message = conn.recv()
+        if message.get("end"):
+            return
+        audio = read_audio(message)
+        with send_lock:
+            conn.send({"ok": True, "ack": True})
+        yield message["offset"], audio
+
+def handle_connection(conn):
+    """Serve one request and send the reply to the API worker."""
+    request = conn.recv()
+    # In pipelined mode acknowledgements are sent from the prefetch thread
+    send_lock = threading.Lock()
+    try:
+        if request.get("op") == "pipeline":
+            result = run_pipelined_transcription(receive_windows(conn, send_lock), **request["params"])
+        else:
+            result = run_transcription(read_audio(request), **request["params"])
+        reply = {"ok": True, "result": result}
+    except HTTPException as e:
+        reply = {"ok": False, "status_code": e.status_code, "detail": e.detail}
+    except Exception as e:
+        logger.error(f"Error during transcription: {e}", exc_info=True)
+        reply = {"ok": False, "status_code": 500, "detail": "Transcription failed"}
+    with send_lock:
+        conn.send(reply)
+
+def accept_connections(listener: Listener, pending: queue.Queue):
+    """
+    Authenticate connections as they arrive and queue them for serving.
+
+    API workers give up on a server that does not complete the handshake within
+    INFERENCE_CONNECT_TIMEOUT_SECONDS, so this must not wait for a running request.
+    """
+    while True:
+        try:
+            pending.put(listener.accept())
+        except (EOFError, ConnectionError, AuthenticationError) as e:
+            logger.warning(f"Connection dropped: {e}")
+
+def serve(address: str):
+    """Serve requests one at a time on the given socket path."""
+    if os.path.exists(address):
+        os.remove(address)
+    # Load the default model up front so the first request does not pay for it
+    load_asr_model(config.ASR_MODEL_NAME, config.DEVICE, config.COMPUTE_TYPE)
+    with Listener(address, family="AF_UNIX", authkey=inference_authkey()) as listener:
+        logger.info(f"Model server listening on {address}")
+        pending: queue.Queue = queue.Queue()
+        threading.Thread(target=accept_connections, args=(listener, pending), daemon=True).start()
+        while True:
+            try:
+                with pending.get() as conn:
+                    handle_connection(conn)
+            except (EOFError, ConnectionError) as e:
+                logger.warning(f"Connection dropped: {e}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="WhisperX model server")
+    parser.add_argument("--index", type=int, default=0, help="Which of the INFERENCE_SERVERS sockets to listen on")
+    args = parser.parse_args()
+    serve(server_addresses()[args.index])
@@ -27,5 +27,18 @@ fi
 export OMP_NUM_THREADS=1  # Prevents issues with parallel processing
 export MKL_NUM_THREADS=1  # For Intel MKL
 
+# Start shared model servers when inference runs outside the API workers
+if [ "${INFERENCE_MODE:-local}" = "server" ]; then
+    # Generate a per-run key unless one is provided; the model servers and uvicorn inherit it
+    if [ -z "$INFERENCE_AUTHKEY" ]; then
+        export INFERENCE_AUTHKEY="$(python -c 'import secrets; print(secrets.token_hex(32))')"
+    fi
+    for ((i = 0; i < ${INFERENCE_SERVERS:-1}; i++)); do
+        echo "Starting model server $i..."
+        python model_server.py --index "$i" &
+    done
+    trap 'kill $(jobs -p) 2>/dev/null' EXIT
+fi
+
 echo "Starting FastAPI server..."
-python -m uvicorn main:app --host 127.0.0.1 --port 8000 --log-level info
\ No newline at end of file
+python -m uvicorn main:app --host 127.0.0.1 --port 8000 --log-level info --workers "${API_WORKERS:-1}"
\ No newline at end of file
@@ -190,7 +190,8 @@ export function VideoEditorProvider({ children }: VideoEditorProviderProps) {
       };
       
       if (currentFile.url.startsWith('blob:')) {
-        data = await transcribeBlob(currentFile.url, currentFile.name || 'video.mp4', effectiveOptions) as TranscriptionData | undefined;
+        const videoId = currentFile.id !== 'default' ? currentFile.id : undefined;
+        data = await transcribeBlob(currentFile.url, currentFile.name || 'video.mp4', effectiveOptions, videoId) as TranscriptionData | undefined;
       } else {
         data = await transcribeFile(currentFile.url, effectiveOptions) as TranscriptionData | undefined;
       }
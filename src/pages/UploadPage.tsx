@@ -1,10 +1,10 @@
 import React, { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
-
-const BASE_URL = process.env.REACT_APP_API_BASE_URL || 'http://localhost:8000';
+import { uploadVideo } from '../services';
 
 const UploadPage: React.FC = () => {
   const [dragActive, setDragActive] = useState<boolean>(false);
+  const [progress, setProgress] = useState<number | null>(null);
   const navigate = useNavigate();
   
   const handleDrag = (e: React.DragEvent<HTMLDivElement>) => {
@@ -36,6 +36,8 @@ const UploadPage: React.FC = () => {
     e.preventDefault();
     if (e.target.files && e.target.files[0]) {
       const file = e.target.files[0];
+      // Allow picking the same file again to resume a failed upload
+      e.target.value = '';
       if (file.type.startsWith('video/')) {
         handleFile(file);
       } else {
@@ -45,35 +47,18 @@ const UploadPage: React.FC = () => {
   };
   
   const handleFile = async (file: File) => {
-    const formData = new FormData();
-    formData.append('file', file);
-
     try {
-      // Send the file to the backend
-      const response = await fetch(`${BASE_URL}/upload`, {
-        method: 'POST',
-        body: formData,
-      });
-
-      if (response.ok) {
-        const result: any = await response.json(); // Consider defining an interface for the response
-        if (result.video_id) {
-          // Navigate to the edit page with video ID from backend
-          navigate(`/edit?video_id=${result.video_id}`);
-        } else {
-          console.error('Backend did not return a video_id:', result);
-          alert('File upload was successful, but could not get video ID. Please try again.');
-        }
-      } else {
-        // Handle server errors (e.g., 500, 400)
-        const errorResult: any = await response.json(); // Consider defining an interface for the error response
-        console.error('File upload failed:', response.statusText, errorResult);
-        alert(`File upload failed: ${errorResult.error || response.statusText}. Please try again.`);
-      }
+      // Send the file to the backend in parallel, resumable chunks
+      setProgress(0);
+      const videoId = await uploadVideo(file, setProgress);
+      // Navigate to the edit page with video ID from backend
+      navigate(`/edit?video_id=${videoId}`);
     } catch (error) {
-      // Handle network errors or other issues with the fetch call
+      // Handle server errors and network issues; the session is kept so a retry resumes it
       console.error('Error uploading file:', error);
-      alert('Error uploading file. Please check your connection and try again.');
+      alert(`File upload failed: ${error instanceof Error ? error.message : error}. Select the same file again to resume.`);
+    } finally {
+      setProgress(null);
     }
   };
   
@@ -87,7 +72,11 @@ const UploadPage: React.FC = () => {
         onDragOver={handleDrag}
         onDrop={handleDrop}
       >
-        <p>Drag and drop your video here</p>
+        <p>
+          {progress === null
+            ? 'Drag and drop your video here'
+            : `Uploading... ${Math.round(progress * 100)}%`}
+        </p>
         <label className="upload-button">
           <input 
             type="file" 
@@ -1 +1,2 @@
-export * from './transcribeService';
\ No newline at end of file
+export * from './transcribeService';
+export * from './uploadService';
\ No newline at end of file
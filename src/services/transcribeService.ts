@@ -7,12 +7,14 @@ const BASE_URL = process.env.REACT_APP_API_BASE_URL || 'http://localhost:8000';
  * @param blobUrl - URL.createObjectURL(videoBlob)
  * @param fileName - name of the file (e.g. 'video.mp4')
  * @param options - Additional transcription options from shared types
+ * @param videoId - ID of the stored video, so the transcript is added to the search index
  * @returns Promise<TranscriptionData> transcription data
  */
 export async function transcribeBlob(
   blobUrl: string, 
   fileName: string, 
-  options: Partial<TranscriptionOptions> = {}
+  options: Partial<TranscriptionOptions> = {},
+  videoId?: string
 ): Promise<TranscriptionData> {
   const resp = await fetch(blobUrl);
   if (!resp.ok) {
@@ -30,7 +32,8 @@ export async function transcribeBlob(
   if (options.vad_onset !== undefined) formData.append('vad_onset', options.vad_onset.toString());
   if (options.compute_type) formData.append('compute_type', options.compute_type);
 
-  const response = await fetch(`${BASE_URL}/transcribe/`, {
+  const query = videoId ? `?video_id=${encodeURIComponent(videoId)}` : '';
+  const response = await fetch(`${BASE_URL}/transcribe/${query}`, {
     method: 'POST',
     body: formData
   });
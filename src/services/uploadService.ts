@@ -0,0 +1,135 @@
+const BASE_URL = process.env.REACT_APP_API_BASE_URL || 'http://localhost:8000';
+
+// Number of chunks sent concurrently
+const PARALLEL_CHUNKS = 4;
+// Attempts per chunk before the upload is abandoned
+const MAX_CHUNK_ATTEMPTS = 5;
+// Delay before the first retry of a chunk; doubled on every further attempt
+const RETRY_BASE_DELAY_MS = 500;
+// Prefix of the localStorage keys that remember unfinished sessions
+const SESSION_KEY_PREFIX = 'upload-session:';
+
+interface UploadSession {
+  upload_id: string;
+  video_id: string;
+  chunk_size: number;
+  chunk_count: number;
+}
+
+interface UploadSessionStatus extends UploadSession {
+  missing_chunks: number[];
+}
+
+async function readError(response: Response, fallback: string): Promise<Error> {
+  try {
+    const errResponse = await response.json();
+    return new Error(errResponse.detail || fallback);
+  } catch (e) {
+    return new Error(response.statusText || fallback);
+  }
+}
+
+function sessionKey(file: File): string {
+  return `${SESSION_KEY_PREFIX}${file.name}:${file.size}:${file.lastModified}`;
+}
+
+function sleep(ms: number): Promise<void> {
+  return new Promise(resolve => setTimeout(resolve, ms));
+}
+
+async function sha256Hex(data: ArrayBuffer): Promise<string> {
+  const digest = await crypto.subtle.digest('SHA-256', data);
+  return Array.from(new Uint8Array(digest))
+    .map(b => b.toString(16).padStart(2, '0'))
+    .join('');
+}
+
+async function uploadChunk(session: UploadSession, file: File, index: number): Promise<void> {
+  const start = index * session.chunk_size;
+  const data = await file.slice(start, start + session.chunk_size).arrayBuffer();
+  const checksum = await sha256Hex(data);
+
+  for (let attempt = 1; ; attempt++) {
+    let response: Response | undefined;
+    try {
+      response = await fetch(`${BASE_URL}/upload/sessions/${session.upload_id}/chunks/${index}`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/octet-stream', 'X-Chunk-SHA256': checksum },
+        body: data,
+      });
+    } catch (error) {
+      // Network failure; retried like a server error
+      if (attempt >= MAX_CHUNK_ATTEMPTS) throw error;
+    }
+    if (response?.ok) return;
+    if (response && (attempt >= MAX_CHUNK_ATTEMPTS || response.status < 500)) {
+      throw await readError(response, `Chunk ${index} failed`);
+    }
+    // Back off with jitter so parallel chunks do not retry in lockstep
+    await sleep(RETRY_BASE_DELAY_MS * 2 ** (attempt - 1) * (0.5 + Math.random()));
+  }
+}
+
+async function resumeSession(uploadId: string): Promise<UploadSessionStatus | null> {
+  const response = await fetch(`${BASE_URL}/upload/sessions/${uploadId}`);
+  // The session expired or was already completed
+  if (response.status === 404) return null;
+  if (!response.ok) throw await readError(response, 'Could not resume upload');
+  return response.json();
+}
+
+/**
+ * Upload a video through the resumable chunked upload API.
+ * Chunks are sent in parallel. The session of an unfinished upload is
+ * remembered per file, so uploading the same file again only sends the
+ * chunks the server is still missing.
+ * @param file - The video file to upload
+ * @param onProgress - Called with the fraction of chunks stored (0-1)
+ * @param resumeUploadId - upload_id of a previous session to resume
+ * @returns Promise<string> the video_id of the stored video
+ */
+export async function uploadVideo(
+  file: File,
+  onProgress?: (fraction: number) => void,
+  resumeUploadId?: string
+): Promise<string> {
+  const key = sessionKey(file);
+  const previousUploadId = resumeUploadId || localStorage.getItem(key);
+  const status = previousUploadId ? await resumeSession(previousUploadId) : null;
+
+  let session: UploadSession;
+  let pending: number[];
+
+  if (status) {
+    session = status;
+    pending = status.missing_chunks;
+  } else {
+    const response = await fetch(`${BASE_URL}/upload/sessions`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ filename: file.name, total_size: file.size, content_type: file.type }),
+    });
+    if (!response.ok) throw await readError(response, 'Could not start upload');
+    session = await response.json();
+    pending = Array.from({ length: session.chunk_count }, (_, i) => i);
+    localStorage.setItem(key, session.upload_id);
+  }
+  onProgress?.((session.chunk_count - pending.length) / session.chunk_count);
+
+  let done = session.chunk_count - pending.length;
+  const queue = [...pending];
+  const worker = async () => {
+    for (let index = queue.shift(); index !== undefined; index = queue.shift()) {
+      await uploadChunk(session, file, index);
+      done += 1;
+      onProgress?.(done / session.chunk_count);
+    }
+  };
+  await Promise.all(Array.from({ length: PARALLEL_CHUNKS }, worker));
+
+  const response = await fetch(`${BASE_URL}/upload/sessions/${session.upload_id}/complete`, { method: 'POST' });
+  if (!response.ok) throw await readError(response, 'Could not complete upload');
+  const result = await response.json();
+  localStorage.removeItem(key);
+  return result.video_id;
+}